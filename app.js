@@ -67,6 +67,21 @@ let efficiencyGaugeChart = null;
 let conditionsRadarChart = null;
 let currentChatSession = null;
 let userContext = {};
+let historyCursor = null;
+let historyRequestId = 0;
+let historySearchTimer = null;
+
+// History records are scoped to a random key kept in this browser
+function historyHeaders(extra = {}) {
+    let owner = localStorage.getItem('historyOwner');
+    if (!owner) {
+        // getRandomValues, unlike randomUUID, also works on plain-http deployments
+        const bytes = crypto.getRandomValues(new Uint8Array(16));
+        owner = Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+        localStorage.setItem('historyOwner', owner);
+    }
+    return { 'X-History-Owner': owner, ...extra };
+}
 
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
@@ -76,7 +91,7 @@ document.addEventListener('DOMContentLoaded', function() {
 function initializeApp() {
     console.log('Initializing AI-Powered Rice Crop Predictor with Chatbot...');
     
-    displayHistoricalData(appData.historical_records);
+    loadHistoricalData(true);
     setupEventListeners();
     initializeChatbot();
     
@@ -106,6 +121,11 @@ function setupEventListeners() {
     if (sortSelect) {
         sortSelect.addEventListener('change', handleSort);
     }
+
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', () => loadHistoricalData(false));
+    }
     
     if (fertilizerTypeSelect) {
         fertilizerTypeSelect.addEventListener('change', updateFertilizerQuantity);
@@ -984,11 +1004,11 @@ function displayResults(prediction) {
     }
 }
 
-function addToHistoricalData(predictionData) {
+async function addToHistoricalData(predictionData) {
     const newRecord = {
-        id: appData.historical_records.length + 1,
         date: predictionData.plantingDate,
         farmer_name: predictionData.farmerName,
+        state: predictionData.state,
         land_area: predictionData.landArea,
         soil_type: predictionData.soilType,
         terrain: predictionData.terrainType,
@@ -1003,87 +1023,166 @@ function addToHistoricalData(predictionData) {
         harvest_date: predictionData.expectedHarvest
     };
     
-    appData.historical_records.push(newRecord);
-    displayHistoricalData(appData.historical_records);
+    try {
+        const response = await fetch('/history', {
+            method: 'POST',
+            headers: historyHeaders({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify(newRecord)
+        });
+        
+        if (!response.ok) {
+            const data = await response.json();
+            throw new Error(data.error || 'Failed to save record');
+        }
+        
+        await loadHistoricalData(true);
+    } catch (error) {
+        console.error('History save error:', error);
+        // Keep the record visible for this session even if the server rejected it
+        appData.historical_records.unshift({ id: `local-${Date.now()}`, ...newRecord });
+        displayHistoricalData(appData.historical_records);
+        toggleHistoricalTable(true);
+    }
+}
+
+async function loadHistoricalData(reset) {
+    const searchInput = document.getElementById('searchInput');
+    const sortSelect = document.getElementById('sortSelect');
+    
+    if (reset) {
+        historyCursor = null;
+    } else if (!historyCursor) {
+        return;
+    }
+    
+    const params = new URLSearchParams({
+        q: searchInput ? searchInput.value.trim() : '',
+        sort: sortSelect ? sortSelect.value : 'date',
+        limit: 50
+    });
+    if (historyCursor) {
+        params.set('cursor', historyCursor);
+    }
     
+    // Ignore responses that arrive after a newer search has been issued
+    const requestId = ++historyRequestId;
+    
+    try {
+        const response = await fetch(`/history?${params}`, { headers: historyHeaders() });
+        const data = await response.json();
+        
+        if (requestId !== historyRequestId) return;
+        
+        if (!response.ok) {
+            throw new Error(data.error || 'Failed to load history');
+        }
+        
+        appData.historical_records = reset ? data.records : appData.historical_records.concat(data.records);
+        historyCursor = data.next_cursor;
+        displayHistoricalData(data.records, !reset);
+        
+        const hasFilter = params.get('q') !== '';
+        toggleHistoricalTable(appData.historical_records.length > 0 || hasFilter);
+        
+        const loadMoreBtn = document.getElementById('loadMoreBtn');
+        if (loadMoreBtn) {
+            loadMoreBtn.classList.toggle('hidden', !historyCursor);
+        }
+    } catch (error) {
+        console.error('History load error:', error);
+    }
+}
+
+function toggleHistoricalTable(hasRecords) {
     const emptyState = document.getElementById('emptyState');
     const tableControls = document.getElementById('tableControls');
     const tableContainer = document.getElementById('tableContainer');
     
-    if (emptyState) emptyState.classList.add('hidden');
-    if (tableControls) tableControls.classList.remove('hidden');
-    if (tableContainer) tableContainer.classList.remove('hidden');
+    if (emptyState) emptyState.classList.toggle('hidden', hasRecords);
+    if (tableControls) tableControls.classList.toggle('hidden', !hasRecords);
+    if (tableContainer) tableContainer.classList.toggle('hidden', !hasRecords);
 }
 
-function displayHistoricalData(records) {
+function displayHistoricalData(records, append = false) {
     const historicalTableBody = document.getElementById('historicalTableBody');
     if (!historicalTableBody) return;
     
-    historicalTableBody.innerHTML = '';
+    const incomeFormat = new Intl.NumberFormat('en-IN', {
+        maximumFractionDigits: 0
+    });
+    
+    // Build all rows off-DOM and insert them in one go
+    const fragment = document.createDocumentFragment();
     
     records.forEach(record => {
         const row = document.createElement('tr');
+        const cells = [
+            new Date(record.date).toLocaleDateString('en-IN'),
+            record.farmer_name,
+            record.land_area,
+            record.soil_type,
+            record.irrigation,
+            record.fertilizer_type,
+            Number(record.predicted_yield).toFixed(1),
+            `${Number(record.efficiency).toFixed(1)}%`,
+            `₹${incomeFormat.format(record.income)}`
+        ];
         
-        const formattedIncome = new Intl.NumberFormat('en-IN', {
-            maximumFractionDigits: 0
-        }).format(record.income);
-        
-        row.innerHTML = `
-            <td>${new Date(record.date).toLocaleDateString('en-IN')}</td>
-            <td>${record.farmer_name}</td>
-            <td>${record.land_area}</td>
-            <td>${record.soil_type}</td>
-            <td>${record.irrigation}</td>
-            <td>${record.fertilizer_type}</td>
-            <td>${record.predicted_yield.toFixed(1)}</td>
-            <td>${record.efficiency.toFixed(1)}%</td>
-            <td>₹${formattedIncome}</td>
-        `;
+        cells.forEach(value => {
+            const cell = document.createElement('td');
+            cell.textContent = value ?? '';
+            row.appendChild(cell);
+        });
         
-        historicalTableBody.appendChild(row);
+        fragment.appendChild(row);
     });
+    
+    if (!append) {
+        historicalTableBody.innerHTML = '';
+    }
+    historicalTableBody.appendChild(fragment);
 }
 
 function handleSearch() {
-    const searchInput = document.getElementById('searchInput');
-    if (!searchInput) return;
-    
-    const searchTerm = searchInput.value.toLowerCase().trim();
-    
-    if (searchTerm === '') {
-        displayHistoricalData(appData.historical_records);
-        return;
-    }
-    
-    const filteredRecords = appData.historical_records.filter(record => 
-        record.farmer_name.toLowerCase().includes(searchTerm) ||
-        record.soil_type.toLowerCase().includes(searchTerm) ||
-        record.irrigation.toLowerCase().includes(searchTerm) ||
-        record.fertilizer_type.toLowerCase().includes(searchTerm)
-    );
-    
-    displayHistoricalData(filteredRecords);
+    // Debounce so typing doesn't fire a request per keystroke
+    clearTimeout(historySearchTimer);
+    historySearchTimer = setTimeout(() => loadHistoricalData(true), 250);
 }
 
 function handleSort() {
+    loadHistoricalData(true);
+}
+
+async function exportHistory() {
+    const searchInput = document.getElementById('searchInput');
     const sortSelect = document.getElementById('sortSelect');
-    if (!sortSelect) return;
-    
-    const sortBy = sortSelect.value;
-    const sortedRecords = [...appData.historical_records].sort((a, b) => {
-        if (sortBy === 'date') {
-            return new Date(b.date) - new Date(a.date);
-        } else if (sortBy === 'farmer_name') {
-            return a.farmer_name.localeCompare(b.farmer_name);
-        } else if (sortBy === 'actual_yield') {
-            return b.predicted_yield - a.predicted_yield;
-        } else if (sortBy === 'income') {
-            return b.income - a.income;
-        }
-        return 0;
+    const params = new URLSearchParams({
+        q: searchInput ? searchInput.value.trim() : '',
+        sort: sortSelect ? sortSelect.value : 'date'
     });
     
-    displayHistoricalData(sortedRecords);
+    // The owner key has to go in a header, so fetch the CSV and save it from a blob
+    try {
+        const response = await fetch(`/history/export.csv?${params}`, { headers: historyHeaders() });
+        if (!response.ok) {
+            const data = await response.json();
+            throw new Error(data.error || 'Failed to export history');
+        }
+        
+        const disposition = response.headers.get('Content-Disposition') || '';
+        const match = disposition.match(/filename=([^;]+)/);
+        const url = URL.createObjectURL(await response.blob());
+        const link = document.createElement('a');
+        link.href = url;
+        link.download = match ? match[1] : 'rice-crop-history.csv';
+        document.body.appendChild(link);
+        link.click();
+        link.remove();
+        URL.revokeObjectURL(url);
+    } catch (error) {
+        console.error('History export error:', error);
+        alert('Failed to export history');
+    }
 }
 
 function showLoadingState(loading) {
@@ -1,46 +1,151 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+import time
+
+_module_start = time.perf_counter()
+
+from flask import Flask, request, jsonify, render_template, send_from_directory, g, has_request_context, Response, stream_with_context, url_for
 from flask_cors import CORS
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
+from werkzeug.security import safe_join
 import os
+import sys
+import importlib
 from dotenv import load_dotenv
-import google.generativeai as genai
 import logging
 import json
 from datetime import datetime
 import re
+import threading
+import itertools
+import hashlib
+import hmac
+import gc
+import math
+import csv
+import io
+import gzip
+import mimetypes
+from history_store import HistoryStore, HISTORY_COLUMNS, SORT_OPTIONS
+from chat_store import ChatStore
+from rate_limiter import RateLimiter, ConcurrencyBudget, SharedRateLimiter, SharedConcurrencyBudget
+from collections import OrderedDict
+from contextlib import contextmanager
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+# Static files are served by static_files() below so that fingerprinted,
+# precompressed assets get long-lived caching and content negotiation
+app = Flask(__name__, static_folder=None)
+# Prediction history is private to the browser that saved it, so it is not
+# opened up to other origins
+CORS(app, resources={r"^/(?!history)": {}})
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Gemini AI
+# Startup timings, reported by /ready. pandas, scikit-learn and the Gemini
+# client are imported on first use so the server can bind its port right away.
+startup_profile = {'imports': {}, 'phases': {}}
+warmup_status = {'state': 'pending', 'error': None}
+
+def import_heavy(module_name):
+    """Import a heavy module on first use, recording how long the import took"""
+    already_loaded = module_name in sys.modules
+    start = time.perf_counter()
+    # Always go through the import system: a module another thread is still
+    # importing is already in sys.modules, half initialized, and import_module
+    # waits on its import lock until it is complete
+    module = importlib.import_module(module_name)
+    if not already_loaded:
+        startup_profile['imports'].setdefault(module_name, round(time.perf_counter() - start, 3))
+    return module
+
+def record_phase(name, start):
+    startup_profile['phases'][name] = round(time.perf_counter() - start, 3)
+
+# Gemini AI, configured on first use
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    MODEL_ID = "models/gemini-1.5-flash-8b"  
+MODEL_ID = "models/gemini-1.5-flash-8b"
+_gemini_model = None
+_gemini_failed = False
+_gemini_lock = threading.Lock()
 
-    try:
-        model = genai.GenerativeModel(MODEL_ID)
-        logger.info("Gemini AI model initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize Gemini AI: {e}")
-        model = None
-else:
+if not GOOGLE_API_KEY:
     logger.warning("GOOGLE_API_KEY not found in environment variables")
-    model = None
 
-# Global variables for caching
-trained_models = {}
-dataset_cache = None
-chat_sessions = {}
+def get_gemini_model():
+    """Return the Gemini model, initializing the client on the first call"""
+    global _gemini_model, _gemini_failed
+    if _gemini_model is not None or _gemini_failed or not GOOGLE_API_KEY:
+        return _gemini_model
+    with _gemini_lock:
+        if _gemini_model is None and not _gemini_failed:
+            start = time.perf_counter()
+            try:
+                genai = import_heavy('google.generativeai')
+                genai.configure(api_key=GOOGLE_API_KEY)
+                _gemini_model = genai.GenerativeModel(MODEL_ID)
+                logger.info("Gemini AI model initialized successfully")
+            except Exception as e:
+                logger.error(f"Failed to initialize Gemini AI: {e}")
+                _gemini_failed = True
+            record_phase('gemini_init', start)
+    return _gemini_model
+
+def gemini_status():
+    if not GOOGLE_API_KEY or _gemini_failed:
+        return 'not configured'
+    return 'configured' if _gemini_model is not None else 'pending'
+
+# Chat history, kept in SQLite so a session can continue on any worker.
+# Under the pre-fork server it lives in the shared directory by default.
+chat_store = None
+_chat_store_lock = threading.Lock()
+CHAT_DB_FILE = 'chat.db'
+
+# Versioned dataset/model snapshots. Requests pin the snapshot that is active
+# when they start, so a reload can swap in a new version without disturbing
+# requests that are already in flight.
+_active_snapshot = None
+_snapshot_lock = threading.Lock()
+_init_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_snapshot_counter = itertools.count(1)
+reload_status = {'state': 'idle', 'path': None, 'error': None, 'finished_at': None}
+RELOAD_REQUEST_FILE = 'reload-request.json'
+RELOAD_STATUS_FILE = 'reload-status.json'
+
+# Server-side prediction history, opened lazily so each worker gets its own connection.
+# Records are scoped to the random owner key the browser keeps in localStorage
+# and sends as X-History-Owner.
+history_store = None
+_history_lock = threading.Lock()
+HISTORY_OWNER_PATTERN = re.compile(r'[A-Za-z0-9_-]{16,64}')
+
+# Admission control for the Gemini-backed endpoints: token buckets per client
+# IP and per chat session, plus a cap on concurrent Gemini calls. Overloaded
+# requests get 429 with Retry-After, or a cached answer where one exists.
+# Created on first use; see get_admission().
+_admission = None
+_admission_lock = threading.Lock()
+ADMISSION_DB_FILE = 'admission.db'
+GEMINI_QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', 2))
+OVERLOAD_RETRY_AFTER = 5
+admission_stats = {'admitted': 0, 'rate_limited': 0, 'overloaded': 0, 'served_from_cache': 0}
+
+# Recent /instructions answers, used as a fallback when Gemini is over budget
+INSTRUCTIONS_CACHE_SIZE = 256
+instructions_cache = OrderedDict()
+_instructions_cache_lock = threading.Lock()
+
+# Per-process request counters. Under a multi-worker server each worker
+# publishes these to WORKER_STATS_DIR so /health can report the whole pool.
+worker_stats = {'requests': 0, 'errors': 0, 'started_at': datetime.now().isoformat()}
+# Probes whose 503s are expected while starting up, not errors
+PROBE_ENDPOINTS = {'readiness_check'}
+_stats_lock = threading.Lock()
+_stats_published_at = 0.0
+STATS_PUBLISH_INTERVAL = 1.0
 
 # Agriculture-focused content filter
 AGRICULTURE_KEYWORDS = [
@@ -53,28 +158,356 @@ AGRICULTURE_KEYWORDS = [
     'horticulture', 'livestock', 'dairy', 'poultry', 'aquaculture'
 ]
 
-def load_dataset():
-    """Load and cache the dataset"""
-    global dataset_cache
-    if dataset_cache is None:
+class DataSnapshot:
+    """Immutable dataset version together with the models trained on it"""
+
+    def __init__(self, version, path, dataset):
+        self.version = version
+        self.path = path
+        self.dataset = dataset
+        self.trained_models = {}
+        self.rf_params = dict(DEFAULT_RF_PARAMS)
+        # Set once every state-soil model has been trained for this snapshot
+        self.warmed = False
+        self.loaded_at = datetime.now().isoformat()
+
+    def info(self):
+        return {
+            'version': self.version,
+            'path': self.path,
+            'records': len(self.dataset),
+            'cached_models': len(self.trained_models),
+            'loaded_at': self.loaded_at
+        }
+
+# Random Forest serving config. rf_model.py measures candidate configs and
+# writes its recommendation to the report; fall back to the defaults without one.
+# Only a per_pair report was tuned on the small per state-soil models served here.
+DEFAULT_RF_PARAMS = {'n_estimators': 100, 'max_depth': 5, 'min_samples_split': 2, 'min_samples_leaf': 1}
+SERVED_RF_SCOPE = 'per_pair'
+CV_FOLDS = 5
+
+def load_rf_params():
+    """Read the Random Forest parameters recommended by the latest evaluation report"""
+    params = dict(DEFAULT_RF_PARAMS)
+    report_path = os.getenv('RF_REPORT_PATH', 'rf_evaluation_report.json')
+    try:
+        with open(report_path) as f:
+            report = json.load(f)
+        scope = report.get('scope', 'global')
+        if scope != SERVED_RF_SCOPE:
+            logger.warning(f"Ignoring {report_path}: tuned at {scope} scope, but models are served "
+                           f"per state-soil pair. Run rf_model.py --scope {SERVED_RF_SCOPE}")
+            return params
+        params.update(report['recommended']['params'])
+        logger.info(f"Using Random Forest config from {report_path}: {params}")
+    except (OSError, ValueError, KeyError) as e:
+        logger.info(f"No usable evaluation report ({e}), using default Random Forest config")
+    return params
+
+def finite_or_none(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+def get_dataset_path():
+    return os.getenv("DATASET_PATH", r"C:\Users\ASUS\OneDrive\Desktop\hackf.xlsx")
+
+def build_snapshot(path, warm=False):
+    """Read a dataset file into a new snapshot, optionally pre-training every model"""
+    pd = import_heavy('pandas')
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:8]
+    dataset = pd.read_excel(path)
+    snapshot = DataSnapshot(f"v{next(_snapshot_counter)}-{digest}", path, dataset)
+    # Re-read the evaluation report so a reload also picks up a new config
+    snapshot.rf_params = load_rf_params()
+
+    if warm and {'State', 'Soil'}.issubset(dataset.columns):
+        pairs = dataset[['State', 'Soil']].drop_duplicates().itertuples(index=False)
+        for state, soil in pairs:
+            train_random_forest_model(state, soil, snapshot=snapshot)
+        snapshot.warmed = True
+        logger.info(f"Warmed {len(snapshot.trained_models)} models for snapshot {snapshot.version}")
+
+    return snapshot
+
+def swap_snapshot(snapshot):
+    """Atomically make a snapshot the one served to new requests"""
+    global _active_snapshot
+    with _snapshot_lock:
+        previous = _active_snapshot
+        _active_snapshot = snapshot
+    logger.info(f"Now serving dataset {snapshot.version} "
+                f"(previous: {previous.version if previous else 'none'})")
+    return previous
+
+def get_snapshot():
+    """Return the snapshot pinned to the current request, or the active one"""
+    if not has_request_context():
+        return _active_snapshot or load_snapshot()
+    if getattr(g, 'snapshot', None) is None:
+        g.snapshot = _active_snapshot or load_snapshot()
+    return g.snapshot
+
+def load_snapshot():
+    """Load the initial snapshot if none is active yet"""
+    with _init_lock:
+        if _active_snapshot is not None:
+            return _active_snapshot
+        path = get_dataset_path()
+        start = time.perf_counter()
         try:
-            directory = os.getenv("DATASET_PATH", r"C:\Users\ASUS\OneDrive\Desktop\hackf.xlsx")
-            dataset_cache = pd.read_excel(directory)
-            logger.info(f"Dataset loaded successfully with {len(dataset_cache)} records")
+            snapshot = build_snapshot(path)
+            logger.info(f"Dataset loaded successfully with {len(snapshot.dataset)} records")
         except Exception as e:
             logger.error(f"Error loading dataset: {e}")
-            dataset_cache = pd.DataFrame()
-    return dataset_cache
+            pd = import_heavy('pandas')
+            snapshot = DataSnapshot(f"v{next(_snapshot_counter)}-empty", path, pd.DataFrame())
+        record_phase('dataset_load', start)
+        swap_snapshot(snapshot)
+        return snapshot
+
+def coordination_dir():
+    """Shared directory used to coordinate reloads under the pre-fork server, None otherwise"""
+    if os.getenv('PREFORK_MASTER_PID'):
+        return os.getenv('WORKER_STATS_DIR')
+    return None
+
+def write_json_atomic(path, data):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+def set_reload_status(**changes):
+    reload_status.update(changes)
+    shared_dir = coordination_dir()
+    if shared_dir:
+        try:
+            write_json_atomic(os.path.join(shared_dir, RELOAD_STATUS_FILE), reload_status)
+        except OSError as e:
+            logger.warning(f"Could not publish reload status: {e}")
+
+def get_reload_status():
+    shared_dir = coordination_dir()
+    if shared_dir:
+        try:
+            with open(os.path.join(shared_dir, RELOAD_STATUS_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return reload_status
+
+def reload_snapshot(path=None, warm=True):
+    """Build and warm a new snapshot, then swap it in. Keeps serving the old one on failure."""
+    if not _reload_lock.acquire(blocking=False):
+        logger.warning("Dataset reload already in progress, skipping")
+        return None
+    return run_locked_reload(path, warm)
+
+def run_locked_reload(path, warm):
+    """Body of reload_snapshot. The caller holds _reload_lock; it is released here."""
+    path = path or get_dataset_path()
+    try:
+        set_reload_status(state='loading', path=path, error=None, finished_at=None)
+        snapshot = build_snapshot(path, warm=warm)
+        swap_snapshot(snapshot)
+        set_reload_status(state='idle', finished_at=datetime.now().isoformat())
+        return snapshot
+    except Exception as e:
+        logger.error(f"Dataset reload from {path} failed, keeping current version: {e}")
+        set_reload_status(state='failed', error=str(e), finished_at=datetime.now().isoformat())
+        return None
+    finally:
+        _reload_lock.release()
+
+def start_background_reload(path=None, warm=True):
+    """Run a reload on a daemon thread. Returns False if one is already running."""
+    # Taken here rather than in the thread, so concurrent callers can't both start one
+    if not _reload_lock.acquire(blocking=False):
+        return False
+    try:
+        threading.Thread(target=run_locked_reload, args=(path, warm), daemon=True).start()
+    except Exception:
+        _reload_lock.release()
+        raise
+    return True
 
-def train_random_forest_model(state, soil):
+def request_reload(path=None, warm=True):
+    """Start a reload, handing it to the pre-fork master when running under one"""
+    shared_dir = coordination_dir()
+    if not shared_dir:
+        return start_background_reload(path, warm)
+
+    request_path = os.path.join(shared_dir, RELOAD_REQUEST_FILE)
+    if get_reload_status().get('state') == 'loading':
+        return False
+    # Write to a private file, then link it into place: the link fails if
+    # another worker's request is already pending, so only one caller wins
+    pending_path = f"{request_path}.{os.getpid()}.{threading.get_ident()}"
+    with open(pending_path, 'w') as f:
+        json.dump({'path': path, 'warm': warm}, f)
+    try:
+        os.link(pending_path, request_path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(pending_path)
+
+def freeze_shared_state():
+    """Move everything loaded so far out of the collector's reach so that gc
+    passes in the workers don't touch (and copy) the shared pages"""
+    gc.unfreeze()
+    gc.collect()
+    gc.freeze()
+
+def run_master_reload_loop(restart_workers, poll_interval=1.0):
+    """
+    Reload coordinator for the pre-fork server, run on a thread in the master.
+
+    A worker can only swap its own copy of the data, so /admin/reload and the
+    dataset file watcher hand reloads to the master instead. The master builds
+    and warms the new snapshot, then restart_workers() gracefully replaces the
+    workers so they fork from it and share it copy-on-write. Old and new
+    workers overlap briefly during the restart, so expect up to twice the
+    per-worker private memory until the old ones exit.
+    """
+    shared_dir = coordination_dir()
+    request_path = os.path.join(shared_dir, RELOAD_REQUEST_FILE)
+    watch_interval = float(os.getenv('DATASET_WATCH_INTERVAL', '0'))
+    last_mtime = None
+    last_watch = 0.0
+
+    while True:
+        time.sleep(poll_interval)
+        try:
+            reload_request = None
+            if os.path.exists(request_path):
+                try:
+                    with open(request_path) as f:
+                        reload_request = json.load(f)
+                except ValueError:
+                    reload_request = {}
+                os.remove(request_path)
+
+            snapshot = _active_snapshot
+            if reload_request is None and watch_interval > 0 and snapshot is not None \
+                    and time.monotonic() - last_watch >= watch_interval:
+                last_watch = time.monotonic()
+                try:
+                    mtime = os.path.getmtime(snapshot.path)
+                except OSError:
+                    mtime = None
+                if last_mtime is not None and mtime is not None and mtime != last_mtime:
+                    logger.info(f"Dataset file {snapshot.path} changed, reloading")
+                    reload_request = {'path': snapshot.path}
+                last_mtime = mtime
+
+            if reload_request is None:
+                continue
+            if reload_snapshot(reload_request.get('path'), reload_request.get('warm', True)) is not None:
+                last_mtime = None
+                freeze_shared_state()
+                restart_workers()
+        except Exception as e:
+            logger.error(f"Reload coordinator error: {e}")
+
+def watch_dataset_file(interval):
+    """Poll the active dataset file and reload it when it changes on disk"""
+    last_mtime = None
+    while True:
+        time.sleep(interval)
+        snapshot = _active_snapshot
+        if snapshot is None:
+            continue
+        try:
+            mtime = os.path.getmtime(snapshot.path)
+        except OSError:
+            continue
+        if last_mtime is not None and mtime != last_mtime:
+            logger.info(f"Dataset file {snapshot.path} changed, reloading")
+            reload_snapshot(snapshot.path)
+        last_mtime = mtime
+
+def start_dataset_watcher():
+    interval = float(os.getenv('DATASET_WATCH_INTERVAL', '0'))
+    if interval > 0:
+        threading.Thread(target=watch_dataset_file, args=(interval,), daemon=True).start()
+        logger.info(f"Watching dataset file for changes every {interval}s")
+
+def run_warmup(init_gemini=True):
+    """Load the dataset and heavy modules up front so the first requests don't pay for them"""
+    start = time.perf_counter()
+    warmup_status['state'] = 'warming'
+    try:
+        snapshot = load_snapshot()
+        import_heavy('sklearn.ensemble')
+        import_heavy('sklearn.model_selection')
+        import_heavy('sklearn.metrics')
+        if init_gemini:
+            get_gemini_model()
+        warmup_status.update(state='done', error=None if not snapshot.dataset.empty
+                             else 'Dataset is empty or could not be loaded')
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+        warmup_status.update(state='failed', error=str(e))
+    record_phase('warmup', start)
+
+    if os.getenv('STARTUP_PROFILE', 'False').lower() == 'true':
+        logger.info(f"Startup profile: {json.dumps(startup_profile, indent=2)}")
+
+def readiness():
+    """Readiness follows the snapshot being served, however it was loaded or reloaded"""
+    snapshot = _active_snapshot
+    warmup_state = warmup_status['state']
+    # Until warm-up is done scikit-learn may still be importing, so only a
+    # snapshot a reload has already trained the models for can be ready early
+    if warmup_state != 'done' and not (snapshot is not None and snapshot.warmed):
+        if warmup_state == 'failed':
+            return False, 'failed', warmup_status['error']
+        return False, 'loading' if warmup_state == 'warming' else 'pending', None
+    if snapshot is not None and not snapshot.dataset.empty:
+        return True, 'ready', None
+    return False, 'failed', reload_status['error'] or 'Dataset is empty or could not be loaded'
+
+def start_background_warmup():
+    threading.Thread(target=run_warmup, daemon=True).start()
+
+def get_chat_store():
+    global chat_store
+    with _chat_store_lock:
+        if chat_store is None:
+            path = os.getenv('CHAT_DB_PATH') or os.path.join(coordination_dir() or '.', CHAT_DB_FILE)
+            chat_store = ChatStore(path, session_ttl=float(os.getenv('CHAT_SESSION_TTL', 86400)))
+        return chat_store
+
+def get_history_store():
+    global history_store
+    with _history_lock:
+        if history_store is None:
+            history_store = HistoryStore(os.getenv('HISTORY_DB_PATH', 'history.db'))
+        return history_store
+
+def load_dataset():
+    """Return the dataset of the current snapshot"""
+    return get_snapshot().dataset
+
+def train_random_forest_model(state, soil, snapshot=None):
     """Train and cache Random Forest model for specific state-soil combination"""
+    snapshot = snapshot or get_snapshot()
+    trained_models = snapshot.trained_models
     model_key = f"{state}_{soil}"
     
     if model_key in trained_models:
         return trained_models[model_key]
     
     try:
-        df = load_dataset()
+        pd = import_heavy('pandas')
+        RandomForestRegressor = import_heavy('sklearn.ensemble').RandomForestRegressor
+        model_selection = import_heavy('sklearn.model_selection')
+        r2_score = import_heavy('sklearn.metrics').r2_score
+
+        df = snapshot.dataset
         if df.empty:
             return None
             
@@ -93,34 +526,27 @@ def train_random_forest_model(state, soil):
             logger.warning(f"Insufficient data for training: {len(X_encoded)} samples")
             return None
         
-        test_size = min(0.2, max(0.1, 1.0 / len(X_encoded)))
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_encoded, y, test_size=test_size, random_state=100
-        )
-        
-        rf = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=5,
-            random_state=100,
-            min_samples_split=2,
-            min_samples_leaf=1
-        )
-        rf.fit(X_train, y_train)
-        
-        y_pred = rf.predict(X_test)
+        # A holdout from a pair's handful of rows is a single row, whose R² is
+        # undefined, so score on out-of-fold predictions over all of them, as
+        # rf_model.py's per_pair search does, then fit on every row
+        rf = RandomForestRegressor(random_state=100, **snapshot.rf_params)
+        folds = model_selection.KFold(n_splits=min(CV_FOLDS, len(X_encoded)), shuffle=True, random_state=100)
+        y_pred = model_selection.cross_val_predict(rf, X_encoded, y, cv=folds)
+        rf.fit(X_encoded, y)
         
         model_data = {
             'model': rf,
             'predictions': y_pred.tolist(),
             'feature_columns': X_encoded.columns.tolist(),
-            'train_score': rf.score(X_train, y_train),
-            'test_score': rf.score(X_test, y_test) if len(X_test) > 0 else rf.score(X_train, y_train),
+            'train_score': finite_or_none(rf.score(X_encoded, y)),
+            # None where R² is undefined, e.g. every row has the same yield
+            'test_score': finite_or_none(r2_score(y, y_pred)),
             'feature_importance': dict(zip(X_encoded.columns, rf.feature_importances_)),
             'sample_count': len(filtered)
         }
         
         trained_models[model_key] = model_data
-        logger.info(f"Model trained successfully for {state}-{soil}. Test score: {model_data['test_score']:.3f}")
+        logger.info(f"Model trained successfully for {state}-{soil}. CV score: {model_data['test_score']}")
         
         return model_data
         
@@ -143,7 +569,8 @@ def get_model_insights(state, soil, user_context=None):
         insights = {
             'prediction_range': f"{min(model_data['predictions']):.2f} - {max(model_data['predictions']):.2f} tons/hectare",
             'average_yield': f"{sum(model_data['predictions']) / len(model_data['predictions']):.2f} tons/hectare",
-            'model_confidence': f"{model_data['test_score']:.1%}",
+            'model_confidence': (f"{model_data['test_score']:.1%}" if model_data['test_score'] is not None
+                                 else 'not enough data to estimate'),
             'sample_size': model_data['sample_count'],
             'top_factors': sorted(model_data['feature_importance'].items(), 
                                 key=lambda x: x[1], reverse=True)[:3]
@@ -156,6 +583,7 @@ def get_model_insights(state, soil, user_context=None):
 
 def generate_agriculture_response(message, session_id, user_context=None):
     """Generate agriculture-focused AI response with model insights"""
+    model = get_gemini_model()
     if not model:
         return "AI service is currently unavailable. Please try again later."
     
@@ -200,36 +628,335 @@ User's question: {message}
 
 Provide detailed, practical advice while staying within agricultural topics. If the question is not agriculture-related, politely redirect to farming topics."""
 
-        # Get or create chat session
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = model.start_chat(history=[])
+        # Rebuild the session from its stored turns; it may have started on another worker
+        store = get_chat_store()
+        history = store.history(session_id)
         
-        chat = chat_sessions[session_id]
-        response = chat.send_message(system_prompt)
-        
-        full_reply = ""
-        for chunk in response:
-            full_reply += chunk.text
+        # Only the Gemini call itself holds a slot, not the model work above
+        with gemini_slot():
+            chat = model.start_chat(history=history)
+            response = chat.send_message(system_prompt)
+            
+            full_reply = ""
+            for chunk in response:
+                full_reply += chunk.text
         
         # Ensure response is agriculture-focused
         if not any(keyword in full_reply.lower() for keyword in AGRICULTURE_KEYWORDS[:10]):
             full_reply = f"Based on agricultural best practices: {full_reply}\n\nFor more specific advice about your crops, please provide details about your farming situation."
         
+        store.append(session_id, system_prompt, full_reply)
         logger.info(f"Agriculture response generated for session {session_id}")
         return full_reply
         
+    except GeminiOverloaded:
+        raise
     except Exception as e:
         logger.error(f"Error generating agriculture response: {e}")
         return "I'm having trouble processing your request. Please try rephrasing your agricultural question."
 
+@app.before_request
+def pin_snapshot():
+    g.snapshot = _active_snapshot
+
+@app.after_request
+def add_version_header(response):
+    snapshot = getattr(g, 'snapshot', None)
+    if snapshot is not None:
+        response.headers['X-Data-Version'] = snapshot.version
+    with _stats_lock:
+        worker_stats['requests'] += 1
+        if response.status_code >= 500 and request.endpoint not in PROBE_ENDPOINTS:
+            worker_stats['errors'] += 1
+    publish_worker_stats()
+    return response
+
+def collect_worker_stats():
+    snapshot = _active_snapshot
+    with _stats_lock:
+        stats = dict(worker_stats)
+    stats.update(
+        pid=os.getpid(),
+        data_version=snapshot.version if snapshot is not None else None,
+        cached_models=len(snapshot.trained_models) if snapshot is not None else 0,
+        gemini_in_flight=get_admission()['gemini'].in_flight,
+        updated_at=time.time()
+    )
+    with _stats_lock:
+        stats.update(admission_stats)
+    return stats
+
+def start_worker_stats():
+    """Reset the counters inherited from the master when a worker is forked"""
+    with _stats_lock:
+        worker_stats.update(requests=0, errors=0, started_at=datetime.now().isoformat())
+        for key in admission_stats:
+            admission_stats[key] = 0
+    publish_worker_stats(force=True)
+
+def publish_worker_stats(force=False):
+    """Write this worker's stats to the shared stats directory, at most once per interval"""
+    global _stats_published_at
+    stats_dir = os.getenv('WORKER_STATS_DIR')
+    if not stats_dir:
+        return
+    now = time.time()
+    if not force and now - _stats_published_at < STATS_PUBLISH_INTERVAL:
+        return
+    _stats_published_at = now
+    try:
+        path = os.path.join(stats_dir, f"worker-{os.getpid()}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(collect_worker_stats(), f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        logger.warning(f"Could not publish worker stats: {e}")
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def aggregate_worker_stats():
+    """Combine the stats published by every live worker"""
+    stats_dir = os.getenv('WORKER_STATS_DIR')
+    if not stats_dir:
+        return [collect_worker_stats()]
+
+    publish_worker_stats(force=True)
+    workers = []
+    for name in os.listdir(stats_dir):
+        if not (name.startswith('worker-') and name.endswith('.json')):
+            continue
+        path = os.path.join(stats_dir, name)
+        try:
+            with open(path) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if pid_alive(stats.get('pid', 0)):
+            workers.append(stats)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return workers
+
+# Static assets. build_assets.py writes content-hashed copies (plus .gz/.br
+# variants) to static/dist and a manifest mapping original names to them.
+STATIC_DIR = os.path.join(app.root_path, 'static')
+ASSET_MANIFEST_PATH = os.path.join(STATIC_DIR, 'dist', 'manifest.json')
+IMMUTABLE_MAX_AGE = 31536000
+PRECOMPRESSED_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html'}
+COMPRESS_MIN_SIZE = 1024
+_asset_manifest = None
+_asset_manifest_warned = False
+
+def load_asset_manifest():
+    """The build manifest, cached once found. A missing one is retried, so a build after startup takes effect."""
+    global _asset_manifest, _asset_manifest_warned
+    if _asset_manifest is None:
+        try:
+            with open(ASSET_MANIFEST_PATH) as f:
+                _asset_manifest = json.load(f)
+        except (OSError, ValueError):
+            if not _asset_manifest_warned:
+                logger.warning("Asset manifest not found, serving unfingerprinted assets. Run build_assets.py")
+                _asset_manifest_warned = True
+            return {}
+    return _asset_manifest
+
+@app.template_global()
+def asset_url(filename):
+    """URL of the fingerprinted build of a static asset, falling back to the source file"""
+    return url_for('static', filename=load_asset_manifest().get(filename, filename))
+
+@app.after_request
+def compress_response(response):
+    """Gzip large dynamic responses when the client accepts it"""
+    if (response.direct_passthrough
+            or response.is_streamed
+            or response.status_code != 200
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers
+            or request.accept_encodings.quality('gzip') <= 0):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def get_admission():
+    """
+    Return the rate limiters and Gemini budget, creating them on first use.
+
+    Under the pre-fork server they are kept in a SQLite file in the shared
+    directory, so the limits apply to the whole worker pool instead of being
+    multiplied by the number of workers.
+    """
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            client_rate = (float(os.getenv('CLIENT_RATE_PER_MIN', 30)), int(os.getenv('CLIENT_BURST', 10)))
+            session_rate = (float(os.getenv('SESSION_RATE_PER_MIN', 12)), int(os.getenv('SESSION_BURST', 5)))
+            max_concurrency = int(os.getenv('GEMINI_MAX_CONCURRENCY', 8))
+
+            shared_dir = coordination_dir()
+            if shared_dir:
+                path = os.path.join(shared_dir, ADMISSION_DB_FILE)
+                _admission = {
+                    'client': SharedRateLimiter(path, 'client', *client_rate),
+                    'session': SharedRateLimiter(path, 'session', *session_rate),
+                    'gemini': SharedConcurrencyBudget(path, 'gemini', max_concurrency),
+                    'shared': True
+                }
+            else:
+                _admission = {
+                    'client': RateLimiter(*client_rate),
+                    'session': RateLimiter(*session_rate),
+                    'gemini': ConcurrencyBudget(max_concurrency),
+                    'shared': False
+                }
+        return _admission
+
+def client_id():
+    if os.getenv('TRUST_PROXY', 'False').lower() == 'true':
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
+def count_admission(outcome):
+    with _stats_lock:
+        admission_stats[outcome] += 1
+
+def too_many_requests(message, retry_after, reason):
+    response = jsonify({'error': message, 'reason': reason, 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def check_rate_limits(session_id=None):
+    """Return a 429 response if the client or session is over its rate, else None"""
+    admission = get_admission()
+    client = client_id()
+    allowed, retry_after = admission['client'].acquire(client)
+    # Clients without a session all send 'default'; the client bucket covers them
+    if allowed and session_id and session_id != 'default':
+        allowed, retry_after = admission['session'].acquire(f"{client}:{session_id}")
+        if not allowed:
+            # The request is rejected, so it shouldn't use up the client's allowance
+            admission['client'].refund(client)
+    if allowed:
+        return None
+    count_admission('rate_limited')
+    logger.warning(f"Rate limited {client_id()} (session {session_id})")
+    return too_many_requests('Too many requests. Please slow down.', retry_after, 'rate_limited')
+
+def acquire_gemini_slot():
+    """Reserve one of the concurrent Gemini calls, waiting briefly for a free slot"""
+    budget = get_admission()['gemini']
+    if budget.try_acquire(timeout=GEMINI_QUEUE_TIMEOUT):
+        count_admission('admitted')
+        return True
+    count_admission('overloaded')
+    logger.warning(f"Gemini concurrency budget exhausted ({budget.limit} in flight)")
+    return False
+
+def release_gemini_slot():
+    get_admission()['gemini'].release()
+
+class GeminiOverloaded(Exception):
+    """No Gemini slot came free within GEMINI_QUEUE_TIMEOUT"""
+
+@contextmanager
+def gemini_slot():
+    """Hold a Gemini slot for the duration of the block, raising GeminiOverloaded if none is free"""
+    if not acquire_gemini_slot():
+        raise GeminiOverloaded()
+    try:
+        yield
+    finally:
+        release_gemini_slot()
+
+def overloaded():
+    return too_many_requests('AI advisor is busy. Please try again shortly.', OVERLOAD_RETRY_AFTER, 'overloaded')
+
+def instructions_cache_key(prediction, crop_data):
+    # Keyed on the request payload so a lookup needs no model work
+    payload = json.dumps({'prediction': prediction, 'crop_data': crop_data}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def cache_instructions(key, instructions_text, insights):
+    with _instructions_cache_lock:
+        instructions_cache[key] = (instructions_text, insights)
+        instructions_cache.move_to_end(key)
+        while len(instructions_cache) > INSTRUCTIONS_CACHE_SIZE:
+            instructions_cache.popitem(last=False)
+
+def cached_instructions_response(key, limited):
+    """Serve a cached answer in place of a rejected request, or the 429 if there is none"""
+    with _instructions_cache_lock:
+        cached = instructions_cache.get(key)
+    if cached is None:
+        return limited
+    count_admission('served_from_cache')
+    instructions_text, insights = cached
+    return jsonify({
+        'instructions': instructions_text,
+        'model_insights': insights,
+        'cached': True,
+        'generated_at': datetime.now().isoformat()
+    })
+
+def is_admin_request():
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+
 # Route handlers
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/static/<path:filename>')
+@app.route('/static/<path:filename>', endpoint='static')
 def static_files(filename):
-    return send_from_directory('static', filename)
+    """Serve static files, preferring a precompressed variant the client accepts"""
+    # Only files the build step content-hashed may be cached forever
+    fingerprinted = filename in set(load_asset_manifest().values())
+    max_age = IMMUTABLE_MAX_AGE if fingerprinted else None
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    # Highest-q encoding the client accepts (q=0 means refused), br on ties
+    response = None
+    candidates = [(request.accept_encodings.quality(encoding), -i, encoding, suffix)
+                  for i, (encoding, suffix) in enumerate(PRECOMPRESSED_ENCODINGS)]
+    for quality, _, encoding, suffix in sorted(candidates, reverse=True):
+        if quality > 0 and os.path.isfile(safe_join(STATIC_DIR, filename + suffix) or ''):
+            response = send_from_directory(STATIC_DIR, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(STATIC_DIR, filename, max_age=max_age)
+
+    response.vary.add('Accept-Encoding')
+    if fingerprinted:
+        # The filename changes whenever the content does, so it never needs revalidating
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -261,6 +988,7 @@ def predict():
                                                  key=lambda x: x[1], reverse=True))[:5]),
             'state': state,
             'soil': soil,
+            'data_version': get_snapshot().version,
             'timestamp': datetime.now().isoformat()
         }
         
@@ -284,6 +1012,12 @@ def instructions():
         if not prediction:
             return jsonify({'error': 'Prediction data is required'}), 400
         
+        # Rate-limited clients get a cached answer or a 429 before any model work
+        cache_key = instructions_cache_key(prediction, crop_data)
+        limited = check_rate_limits()
+        if limited is not None:
+            return cached_instructions_response(cache_key, limited)
+        
         # Get model insights
         insights = None
         if crop_data.get('state') and crop_data.get('soil'):
@@ -323,13 +1057,19 @@ Provide specific, actionable recommendations for:
 
 Keep advice practical and region-appropriate."""
 
+        model = get_gemini_model()
         if model:
-            chat = model.start_chat(history=[])
-            response = chat.send_message(prompt)
-            
-            full_reply = ""
-            for chunk in response:
-                full_reply += chunk.text
+            try:
+                with gemini_slot():
+                    chat = model.start_chat(history=[])
+                    response = chat.send_message(prompt)
+                    
+                    full_reply = ""
+                    for chunk in response:
+                        full_reply += chunk.text
+            except GeminiOverloaded:
+                return cached_instructions_response(cache_key, overloaded())
+            cache_instructions(cache_key, full_reply, insights)
         else:
             full_reply = "AI service unavailable. Please check your configuration."
         
@@ -361,7 +1101,14 @@ def chat():
         if len(message) > 1000:
             return jsonify({'error': 'Message too long. Please keep it under 1000 characters.'}), 400
         
-        response_text = generate_agriculture_response(message, session_id, user_context)
+        limited = check_rate_limits(session_id)
+        if limited is not None:
+            return limited
+        
+        try:
+            response_text = generate_agriculture_response(message, session_id, user_context)
+        except GeminiOverloaded:
+            return overloaded()
         
         return jsonify({
             'response': response_text,
@@ -378,12 +1125,14 @@ def chat():
 def new_chat_session():
     """Create a new chat session"""
     try:
+        limited = check_rate_limits()
+        if limited is not None:
+            return limited
+        
         import uuid
         session_id = str(uuid.uuid4())[:8]
         
-        # Initialize with agriculture welcome message
-        if model:
-            chat_sessions[session_id] = model.start_chat(history=[])
+        get_chat_store().create_session(session_id)
         
         return jsonify({
             'session_id': session_id,
@@ -396,15 +1145,177 @@ def new_chat_session():
 
 @app.route('/health', methods=['GET'])
 def health_check():
+    snapshot = g.snapshot
+    workers = aggregate_worker_stats()
     return jsonify({
         'status': 'healthy',
-        'gemini_ai': 'configured' if model else 'not configured',
-        'dataset_loaded': len(dataset_cache) if dataset_cache is not None else 0,
-        'cached_models': len(trained_models),
-        'active_chat_sessions': len(chat_sessions),
+        'gemini_ai': gemini_status(),
+        'ready': readiness()[0],
+        'dataset_loaded': len(snapshot.dataset) if snapshot is not None else 0,
+        'cached_models': len(snapshot.trained_models) if snapshot is not None else 0,
+        'data_version': snapshot.version if snapshot is not None else None,
+        'rf_params': snapshot.rf_params if snapshot is not None else None,
+        'active_chat_sessions': get_chat_store().count(),
+        'workers': {
+            'count': len(workers),
+            'requests': sum(w['requests'] for w in workers),
+            'errors': sum(w['errors'] for w in workers),
+            'data_versions': sorted({w['data_version'] for w in workers if w['data_version']}),
+            'processes': workers
+        },
+        'admission': {
+            **gemini_usage(workers),
+            **{key: sum(w[key] for w in workers) for key in admission_stats}
+        },
         'timestamp': datetime.now().isoformat()
     })
 
+def gemini_usage(workers):
+    admission = get_admission()
+    if admission['shared']:
+        # One budget for the whole pool; every worker reports the same count
+        return {'gemini_in_flight': admission['gemini'].in_flight,
+                'gemini_max_concurrency': admission['gemini'].limit}
+    return {'gemini_in_flight': sum(w['gemini_in_flight'] for w in workers),
+            'gemini_max_concurrency': admission['gemini'].limit * len(workers)}
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until the dataset and models are loaded. /health only reports liveness."""
+    ready, state, error = readiness()
+    snapshot = _active_snapshot
+    return jsonify({
+        'ready': ready,
+        'state': state,
+        'error': error,
+        'data_version': snapshot.version if snapshot is not None else None,
+        'startup_profile': startup_profile,
+        'timestamp': datetime.now().isoformat()
+    }), 200 if ready else 503
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Load a new dataset version in the background and swap it in when warm"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    data = request.get_json(silent=True) or {}
+    path = data.get('path')
+    if path and not os.path.isfile(path):
+        return jsonify({'error': f'Dataset file not found: {path}'}), 400
+
+    if not request_reload(path, warm=data.get('warm', True)):
+        return jsonify({'error': 'Reload already in progress', 'reload': get_reload_status()}), 409
+
+    return jsonify({
+        'status': 'reloading',
+        'path': path or get_dataset_path(),
+        'serving_version': g.snapshot.version if g.snapshot is not None else None,
+        'timestamp': datetime.now().isoformat()
+    }), 202
+
+@app.route('/admin/version', methods=['GET'])
+def admin_version():
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    return jsonify({
+        'active': g.snapshot.info() if g.snapshot is not None else None,
+        'reload': get_reload_status(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+def history_owner():
+    """The X-History-Owner key of the request, or None if missing or malformed"""
+    owner = request.headers.get('X-History-Owner', '')
+    return owner if HISTORY_OWNER_PATTERN.fullmatch(owner) else None
+
+def missing_owner():
+    return jsonify({'error': 'A valid X-History-Owner header is required'}), 401
+
+@app.route('/history', methods=['POST'])
+def add_history_record():
+    try:
+        owner = history_owner()
+        if owner is None:
+            return missing_owner()
+
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        record = get_history_store().add(owner, data)
+        return jsonify(record), 201
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"History insert error: {e}")
+        return jsonify({'error': 'Failed to save record'}), 500
+
+def history_filters():
+    return {
+        'search': request.args.get('q', '').strip() or None,
+        'sort': request.args.get('sort', 'date'),
+        'soil': request.args.get('soil') or None,
+        'state': request.args.get('state') or None
+    }
+
+@app.route('/history', methods=['GET'])
+def list_history():
+    """Keyset-paginated history search. Pass next_cursor back as ?cursor= for the next page."""
+    owner = history_owner()
+    if owner is None:
+        return missing_owner()
+    try:
+        records, next_cursor = get_history_store().query(
+            owner,
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', 50, type=int),
+            **history_filters()
+        )
+        return jsonify({
+            'records': records,
+            'next_cursor': next_cursor,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"History query error: {e}")
+        return jsonify({'error': 'Failed to load history'}), 500
+
+@app.route('/history/export.csv', methods=['GET'])
+def export_history():
+    """Stream matching history records as CSV, one row at a time"""
+    owner = history_owner()
+    if owner is None:
+        return missing_owner()
+    filters = history_filters()
+    if filters['sort'] not in SORT_OPTIONS:
+        return jsonify({'error': f"Unsupported sort: {filters['sort']}"}), 400
+    store = get_history_store()
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(HISTORY_COLUMNS)
+        for record in store.iter_rows(owner, **filters):
+            writer.writerow([record[column] for column in HISTORY_COLUMNS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+
+    filename = f"rice-crop-history-{datetime.now().strftime('%Y-%m-%d')}.csv"
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/dataset-info', methods=['GET'])
 def dataset_info():
     try:
@@ -420,6 +1331,7 @@ def dataset_info():
             'soil_types': sorted(df['Soil'].unique().tolist()) if 'Soil' in df.columns else [],
             'data_shape': df.shape,
             'missing_values': df.isnull().sum().to_dict(),
+            'data_version': get_snapshot().version,
             'timestamp': datetime.now().isoformat()
         }
         
@@ -429,11 +1341,33 @@ def dataset_info():
         logger.error(f"Dataset info error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def create_app(preload=True):
+    """App factory for pre-fork WSGI servers (see gunicorn.conf.py).
+
+    With preload_app enabled this runs once in the master process: the dataset
+    and, if PRELOAD_MODELS is set, every state-soil model are built before the
+    workers fork, so all workers share those pages copy-on-write.
+    """
+    if preload and _active_snapshot is None:
+        warm = os.getenv('PRELOAD_MODELS', 'True').lower() == 'true'
+        if warm:
+            reload_snapshot(warm=True)
+        # The Gemini client holds network connections that must not cross a fork,
+        # so each worker creates its own on first use
+        run_warmup(init_gemini=False)
+        freeze_shared_state()
+    return app
+
+record_phase('app_import', _module_start)
+
 if __name__ == '__main__':
-    # Load dataset on startup
-    load_dataset()
+    # Load the dataset in the background so the port is bound immediately;
+    # /ready reports when it has finished
+    start_background_warmup()
+    start_dataset_watcher()
     
     logger.info("Starting Rice Crop Prediction Application with AI Chatbot")
+    logger.info(f"App imported in {startup_profile['phases']['app_import']}s")
     
     app.run(
         debug=os.getenv('FLASK_DEBUG', 'False').lower() == 'true',
@@ -0,0 +1,80 @@
+# Build step for static assets
+# Writes content-hashed copies of the CSS/JS into static/dist together with
+# precompressed .gz (and .br when the brotli package is installed) variants,
+# plus a manifest.json the app uses to resolve asset URLs.
+#
+# Run after changing any asset: python build_assets.py
+
+import os
+import sys
+import json
+import gzip
+import hashlib
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Assets referenced from templates, relative to the static folder
+ASSETS = ['css/style.css', 'js/app.js']
+
+
+def fingerprint(name, content):
+    root, ext = os.path.splitext(name)
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return f"{root}.{digest}{ext}"
+
+
+def build_asset(name):
+    with open(os.path.join(STATIC_DIR, name), 'rb') as f:
+        content = f.read()
+
+    hashed_name = fingerprint(name, content)
+    target = os.path.join(DIST_DIR, hashed_name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    with open(target, 'wb') as f:
+        f.write(content)
+    # mtime=0 keeps the gzip output byte-for-byte reproducible
+    with open(target + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(target + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+    print(f"   • {name} -> dist/{hashed_name} ({len(content):,} bytes)")
+    return 'dist/' + hashed_name
+
+
+def build_assets():
+    print("📦 Building static assets...")
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for name in ASSETS:
+        if not os.path.isfile(os.path.join(STATIC_DIR, name)):
+            print(f"   ⚠️ Skipping missing asset: {name}")
+            continue
+        manifest[name] = build_asset(name)
+
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if brotli is None:
+        print("   ⚠️ brotli not installed, only gzip variants were written")
+    print(f"✅ Wrote {len(manifest)} assets to {DIST_DIR}")
+    return manifest
+
+
+if __name__ == "__main__":
+    if not build_assets():
+        sys.exit(1)
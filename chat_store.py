@@ -0,0 +1,77 @@
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id TEXT PRIMARY KEY,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions (updated);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id);
+"""
+
+
+class ChatStore:
+    """
+    SQLite-backed chat history, so any worker process can continue any session.
+
+    Gemini chat objects can't be shared between processes, so each request
+    rebuilds one from the stored turns with model.start_chat(history=...).
+    """
+
+    def __init__(self, path, max_messages=40, session_ttl=86400):
+        self.path = path
+        self.max_messages = max_messages
+        self.session_ttl = session_ttl
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        # One connection per thread; each worker process opens its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def create_session(self, session_id):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO chat_sessions (session_id, updated) VALUES (?, ?)",
+                         (session_id, now))
+            # Sessions idle longer than the TTL are dropped along with their turns
+            cutoff = now - self.session_ttl
+            conn.execute("DELETE FROM chat_messages WHERE session_id IN "
+                         "(SELECT session_id FROM chat_sessions WHERE updated < ?)", (cutoff,))
+            conn.execute("DELETE FROM chat_sessions WHERE updated < ?", (cutoff,))
+
+    def history(self, session_id):
+        """Most recent turns of a session, oldest first, in the format start_chat() takes"""
+        rows = self._connect().execute(
+            "SELECT role, text FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, self.max_messages)
+        ).fetchall()
+        return [{'role': role, 'parts': [text]} for role, text in reversed(rows)]
+
+    def append(self, session_id, user_text, model_text):
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO chat_sessions (session_id, updated) VALUES (?, ?)",
+                         (session_id, time.time()))
+            conn.executemany("INSERT INTO chat_messages (session_id, role, text) VALUES (?, ?, ?)",
+                             [(session_id, 'user', user_text), (session_id, 'model', model_text)])
+
+    def count(self):
+        """Sessions active within the TTL"""
+        return self._connect().execute("SELECT COUNT(*) FROM chat_sessions WHERE updated >= ?",
+                                       (time.time() - self.session_ttl,)).fetchone()[0]
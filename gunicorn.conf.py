@@ -0,0 +1,53 @@
+# Production server configuration
+# Run with: gunicorn -c gunicorn.conf.py
+
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+
+wsgi_app = "app:create_app()"
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}"
+
+# One worker per core, each with a small thread pool for the Gemini calls
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.getenv('WORKER_THREADS', 4))
+worker_class = 'gthread'
+
+# The Gemini budget is shared by the whole pool; by default let half of the
+# request threads wait on Gemini so the rest stay free for cheap endpoints
+os.environ.setdefault('GEMINI_MAX_CONCURRENCY', str(max(1, workers * threads // 2)))
+timeout = int(os.getenv('WORKER_TIMEOUT', 120))
+
+# Load the dataset and models in the master so workers share them copy-on-write
+preload_app = True
+
+
+def on_starting(server):
+    os.environ['PREFORK_MASTER_PID'] = str(os.getpid())
+    if not os.getenv('WORKER_STATS_DIR'):
+        os.environ['WORKER_STATS_DIR'] = tempfile.mkdtemp(prefix='rice-worker-stats-')
+        server._owns_stats_dir = True
+
+
+def when_ready(server):
+    # Reloads run in the master, which then HUPs itself: gunicorn starts fresh
+    # workers forked from the new data and gracefully retires the old ones
+    from app import run_master_reload_loop
+    threading.Thread(
+        target=run_master_reload_loop,
+        args=(lambda: os.kill(server.pid, signal.SIGHUP),),
+        daemon=True
+    ).start()
+
+
+def post_fork(server, worker):
+    from app import start_worker_stats
+    start_worker_stats()
+
+
+def on_exit(server):
+    if getattr(server, '_owns_stats_dir', False):
+        shutil.rmtree(os.environ['WORKER_STATS_DIR'], ignore_errors=True)
@@ -27,6 +27,23 @@ def check_application_health():
         print(f"❌ Health check error: {e}")
         return False
 
+def check_application_ready():
+    """Check that the dataset has finished loading"""
+    try:
+        response = requests.get('http://127.0.0.1:5000/ready', timeout=10)
+        ready_data = response.json()
+        
+        if response.status_code == 200:
+            print(f"✅ Application is ready (data version {ready_data.get('data_version')})")
+            return True
+        else:
+            print(f"❌ Application not ready: {ready_data.get('state')} {ready_data.get('error') or ''}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Readiness check error: {e}")
+        return False
+
 def test_prediction_api():
     """Test the prediction endpoint"""
     try:
@@ -77,6 +94,7 @@ if __name__ == "__main__":
     all_tests_passed = True
     
     all_tests_passed &= check_application_health()
+    all_tests_passed &= check_application_ready()
     all_tests_passed &= test_prediction_api()
     all_tests_passed &= test_chat_api()
     
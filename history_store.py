@@ -0,0 +1,211 @@
+import sqlite3
+import threading
+import json
+import base64
+from datetime import datetime
+
+# Columns stored for every prediction record, in table/CSV order
+HISTORY_COLUMNS = [
+    'id', 'date', 'farmer_name', 'state', 'land_area', 'soil_type', 'terrain',
+    'irrigation', 'fertilizer_type', 'fertilizer_quantity', 'seed_type',
+    'previous_crop', 'predicted_yield', 'efficiency', 'income', 'harvest_date',
+    'created_at'
+]
+
+NUMERIC_COLUMNS = {'land_area', 'fertilizer_quantity', 'predicted_yield', 'efficiency', 'income'}
+REQUIRED_NUMERIC_COLUMNS = {'predicted_yield', 'efficiency', 'income'}
+
+# Sort keys accepted from the client -> (column, direction). Every sort column
+# has an (owner, column, id) index so keyset pages are index range scans.
+SORT_OPTIONS = {
+    'date': ('date', 'DESC'),
+    'farmer_name': ('farmer_name', 'ASC'),
+    'actual_yield': ('predicted_yield', 'DESC'),
+    'income': ('income', 'DESC')
+}
+
+# Free-text search matches substrings of these columns
+SEARCH_COLUMNS = ['farmer_name', 'soil_type', 'irrigation', 'fertilizer_type']
+
+# Shortest query the trigram index can serve; shorter ones fall back to a scan
+MIN_INDEXED_SEARCH = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    date TEXT NOT NULL,
+    farmer_name TEXT NOT NULL COLLATE NOCASE,
+    state TEXT COLLATE NOCASE,
+    land_area REAL,
+    soil_type TEXT COLLATE NOCASE,
+    terrain TEXT,
+    irrigation TEXT,
+    fertilizer_type TEXT,
+    fertilizer_quantity REAL,
+    seed_type TEXT,
+    previous_crop TEXT,
+    predicted_yield REAL NOT NULL DEFAULT 0,
+    efficiency REAL NOT NULL DEFAULT 0,
+    income REAL NOT NULL DEFAULT 0,
+    harvest_date TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_farmer ON history (owner, farmer_name, id);
+CREATE INDEX IF NOT EXISTS idx_history_date ON history (owner, date, id);
+CREATE INDEX IF NOT EXISTS idx_history_soil ON history (owner, soil_type, id);
+CREATE INDEX IF NOT EXISTS idx_history_state ON history (owner, state, id);
+CREATE INDEX IF NOT EXISTS idx_history_yield ON history (owner, predicted_yield, id);
+CREATE INDEX IF NOT EXISTS idx_history_income ON history (owner, income, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    farmer_name, soil_type, irrigation, fertilizer_type,
+    content='history', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, farmer_name, soil_type, irrigation, fertilizer_type)
+    VALUES (new.id, new.farmer_name, new.soil_type, new.irrigation, new.fertilizer_type);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, farmer_name, soil_type, irrigation, fertilizer_type)
+    VALUES ('delete', old.id, old.farmer_name, old.soil_type, old.irrigation, old.fertilizer_type);
+END;
+"""
+
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(value, row_id):
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    # Sort columns are NOT NULL text or numbers; anything else can't be bound
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)) \
+            or isinstance(row_id, bool) or not isinstance(row_id, int):
+        raise ValueError('Invalid cursor')
+    return value, row_id
+
+
+class HistoryStore:
+    """
+    SQLite-backed store for prediction history with keyset pagination.
+
+    Every record belongs to an owner key, and every read is scoped to one, so
+    a client only sees the records it saved.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        # One connection per thread; each worker process opens its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, owner, record):
+        """Insert a record for owner and return it as stored"""
+        if not isinstance(record, dict):
+            raise ValueError('Record must be a JSON object')
+        if not record.get('farmer_name') or not record.get('date'):
+            raise ValueError('farmer_name and date are required')
+
+        values = {}
+        for column in HISTORY_COLUMNS[1:-1]:
+            value = record.get(column)
+            if column in NUMERIC_COLUMNS:
+                try:
+                    value = float(value) if value not in (None, '') else None
+                except (TypeError, ValueError):
+                    raise ValueError(f'{column} must be a number')
+            if column in REQUIRED_NUMERIC_COLUMNS and value is None:
+                value = 0.0
+            values[column] = value
+        values['created_at'] = datetime.now().isoformat()
+
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                f"INSERT INTO history (owner, {', '.join(values)}) VALUES (?, {', '.join('?' * len(values))})",
+                [owner] + list(values.values())
+            )
+        return dict(values, id=cursor.lastrowid)
+
+    def _where(self, owner, search=None, soil=None, state=None):
+        clauses, params = ["owner = ?"], [owner]
+        if search and len(search) >= MIN_INDEXED_SEARCH:
+            # Substring match through the trigram index, quoted as one phrase
+            clauses.append("id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+            params.append('"' + search.replace('"', '""') + '"')
+        elif search:
+            clauses.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in SEARCH_COLUMNS) + ")")
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            params += [pattern] * len(SEARCH_COLUMNS)
+        if soil:
+            clauses.append("soil_type = ?")
+            params.append(soil)
+        if state:
+            clauses.append("state = ?")
+            params.append(state)
+        return clauses, params
+
+    def _select(self, owner, search, sort, soil, state, cursor=None):
+        if sort not in SORT_OPTIONS:
+            raise ValueError(f'Unsupported sort: {sort}')
+        column, direction = SORT_OPTIONS[sort]
+
+        clauses, params = self._where(owner, search, soil, state)
+        if cursor:
+            value, row_id = decode_cursor(cursor)
+            op = '<' if direction == 'DESC' else '>'
+            clauses.append(f"({column}, id) {op} (?, ?)")
+            params += [value, row_id]
+
+        columns = ', '.join(HISTORY_COLUMNS)
+        sql = f"SELECT {columns} FROM history WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {column} {direction}, id {direction}"
+        return sql, params, column
+
+    def query(self, owner, search=None, sort='date', cursor=None, limit=50, soil=None, state=None):
+        """Return one page of owner's records and the cursor for the next page"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sql, params, column = self._select(owner, search, sort, soil, state, cursor)
+        rows = [dict(row) for row in self._connect().execute(sql + " LIMIT ?", params + [limit + 1])]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][column], rows[-1]['id'])
+        return rows, next_cursor
+
+    def iter_rows(self, owner, search=None, sort='date', soil=None, state=None):
+        """Yield every matching record from a single query, without loading the full result set"""
+        sql, params, _ = self._select(owner, search, sort, soil, state)
+        # Its own connection, so the long-running read doesn't hold the
+        # thread's shared connection in a transaction while the export streams
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(sql, params)
+            while True:
+                batch = rows.fetchmany(MAX_PAGE_SIZE)
+                if not batch:
+                    return
+                for row in batch:
+                    yield dict(row)
+        finally:
+            conn.close()
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM history").fetchone()[0]
@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class RateLimiter:
+    """Token bucket rate limiter keyed by client or session id"""
+
+    def __init__(self, rate_per_minute, burst, max_keys=10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """
+        Take one token for key.
+
+        Returns:
+            (allowed, retry_after) where retry_after is the number of seconds
+            until a token is available again, 0 when allowed
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+            if tokens >= 1:
+                allowed, retry_after = True, 0.0
+                tokens -= 1
+            else:
+                allowed, retry_after = False, (1 - tokens) / self.rate
+
+            # Most recently used keys go to the end; evict idle ones from the front
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, retry_after
+
+    def refund(self, key):
+        """Give back a token taken by acquire() for a request that was rejected elsewhere"""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + 1), updated)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyBudget:
+    """Caps how many calls may be in flight at once across all clients"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, timeout=0):
+        if not self._semaphore.acquire(timeout=timeout):
+            return False
+        with self._lock:
+            self._in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _SharedState:
+    """SQLite file shared by all worker processes of a pre-fork server"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS buckets (
+        name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (name, key)
+    );
+    CREATE INDEX IF NOT EXISTS idx_buckets_updated ON buckets (updated);
+    CREATE TABLE IF NOT EXISTS slots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        pid INTEGER NOT NULL,
+        started REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self.connect().executescript(self.SCHEMA)
+
+    def connect(self):
+        # Connections must not cross a fork, so they are per process as well as per thread
+        pid, conn = getattr(self._local, 'conn', (None, None))
+        if pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = (os.getpid(), conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        # sequences are atomic across processes
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+
+class SharedRateLimiter:
+    """Token bucket rate limiter whose buckets are shared by every worker process"""
+
+    def __init__(self, path, name, rate_per_minute, burst, prune_every=1000):
+        self.state = _SharedState(path)
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.prune_every = prune_every
+        self._calls = 0
+
+    def acquire(self, key):
+        """Same contract as RateLimiter.acquire"""
+        now = time.time()
+        with self.state.transaction() as conn:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ? AND key = ?",
+                               (self.name, key)).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+
+            if tokens >= 1:
+                allowed, retry_after = True, 0.0
+                tokens -= 1
+            else:
+                allowed, retry_after = False, (1 - tokens) / self.rate
+
+            conn.execute("INSERT OR REPLACE INTO buckets (name, key, tokens, updated) VALUES (?, ?, ?, ?)",
+                         (self.name, key, tokens, now))
+
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                # Buckets idle long enough to have refilled are the same as missing ones
+                conn.execute("DELETE FROM buckets WHERE name = ? AND updated < ?",
+                             (self.name, now - self.burst / self.rate))
+
+        return allowed, retry_after
+
+    def refund(self, key):
+        """Same contract as RateLimiter.refund"""
+        with self.state.transaction() as conn:
+            conn.execute("UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE name = ? AND key = ?",
+                         (self.burst, self.name, key))
+
+
+class SharedConcurrencyBudget:
+    """Caps in-flight calls across every worker process, reclaiming slots held by dead workers"""
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, path, name, limit):
+        self.state = _SharedState(path)
+        self.name = name
+        self.limit = limit
+        self._held = threading.local()
+
+    def _try_take(self):
+        with self.state.transaction() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM slots WHERE name = ?", (self.name,)).fetchone()[0]
+            if count >= self.limit:
+                pids = [row[0] for row in conn.execute(
+                    "SELECT DISTINCT pid FROM slots WHERE name = ?", (self.name,))]
+                dead = [pid for pid in pids if not _pid_alive(pid)]
+                if not dead:
+                    return None
+                conn.execute(f"DELETE FROM slots WHERE name = ? AND pid IN ({', '.join('?' * len(dead))})",
+                             [self.name] + dead)
+            cursor = conn.execute("INSERT INTO slots (name, pid, started) VALUES (?, ?, ?)",
+                                  (self.name, os.getpid(), time.time()))
+            return cursor.lastrowid
+
+    def try_acquire(self, timeout=0):
+        deadline = time.monotonic() + timeout
+        while True:
+            slot = self._try_take()
+            if slot is not None:
+                self._held.__dict__.setdefault('slots', []).append(slot)
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.POLL_INTERVAL)
+
+    def release(self):
+        slot = self._held.slots.pop()
+        with self.state.transaction() as conn:
+            conn.execute("DELETE FROM slots WHERE id = ?", (slot,))
+
+    @property
+    def in_flight(self):
+        return self.state.connect().execute(
+            "SELECT COUNT(*) FROM slots WHERE name = ?", (self.name,)).fetchone()[0]
@@ -15,6 +15,7 @@ pip install -r requirements.txt
 echo Setup complete! Don't forget to:
 echo 1. Create .env file with your GOOGLE_API_KEY
 echo 2. Move your files to correct directories  
-echo 3. Run: python app.py
+echo 3. Build assets: python build_assets.py
+echo 4. Run: python app.py
 
 pause
\ No newline at end of file